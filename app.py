@@ -4,8 +4,10 @@
 This is a Streamlit app with the COUNTRIES mapping expanded to include all G20 members plus the EU entry.
 """
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
 
 import streamlit as st
 import pandas as pd
@@ -39,14 +41,46 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-@st.cache_data(ttl=60 * 60)
-def get_fred(series_id: str, pct_change_yoy: bool = False) -> pd.DataFrame:
+@st.cache_resource(show_spinner=False)
+def _fred_client():
     if Fred is None:
         raise RuntimeError("fredapi not installed")
-    key = st.secrets.get("FRED_API_KEY") if hasattr(st, "secrets") else os.getenv("FRED_API_KEY")
+    try:
+        key = st.secrets.get("FRED_API_KEY")
+    except (FileNotFoundError, KeyError):  # no secrets.toml
+        key = None
+    key = key or os.getenv("FRED_API_KEY")
     if not key:
         raise RuntimeError("Missing FRED_API_KEY (set in Streamlit secrets)")
-    fred = Fred(api_key=key)
+    return Fred(api_key=key)
+
+@st.cache_resource(show_spinner=False)
+def _cache_bucket() -> dict:
+    return {"hour": None, "lock": threading.Lock()}
+
+# Persisted caches ignore ttl, so expiry comes from an hourly bucket in the cache key.
+# max_entries only bounds the in-memory layer, so drop the on-disk entries whenever
+# the bucket rolls over; otherwise a new set of pickles would pile up every hour.
+def _cache_hour() -> int:
+    hour = int(time.time() // 3600)
+    bucket = _cache_bucket()
+    with bucket["lock"]:
+        if bucket["hour"] != hour:
+            if bucket["hour"] is not None:
+                _get_fred.clear()
+                _get_wb.clear()
+            bucket["hour"] = hour
+    return hour
+
+def get_fred(series_id: str, pct_change_yoy: bool = False) -> pd.DataFrame:
+    return _get_fred(series_id, pct_change_yoy, _cache_hour())
+
+def get_wb(country: str, indicator: str) -> pd.DataFrame:
+    return _get_wb(country, indicator, _cache_hour())
+
+@st.cache_data(persist="disk", max_entries=512, show_spinner=False)
+def _get_fred(series_id: str, pct_change_yoy: bool, hour: int) -> pd.DataFrame:
+    fred = _fred_client()
     s = fred.get_series(series_id)
     df = s.rename("value").to_frame()
     df.index = pd.to_datetime(df.index)
@@ -55,35 +89,32 @@ def get_fred(series_id: str, pct_change_yoy: bool = False) -> pd.DataFrame:
     if pct_change_yoy:
         df["value"] = df["value"].pct_change(12) * 100
         df = df.dropna()
-    return df
+    return df.astype({"value": np.float32})
 
-@st.cache_data(ttl=60 * 60)
-def get_wb(country: str, indicator: str) -> pd.DataFrame:
+@st.cache_data(persist="disk", max_entries=512, show_spinner=False)
+def _get_wb(country: str, indicator: str, hour: int) -> pd.DataFrame:
     if wb is None:
         raise RuntimeError("wbgapi not installed")
     try:
-        data = wb.data.DataFrame(indicator, economy=country, time=range(datetime.now().year - 20, datetime.now().year+1))
-        data = data.T.reset_index()
-        data.columns = ["date", "value"]
-        # ------------------------
-        # NEW: Strip 'YR' prefix if present
-        data["date"] = data["date"].astype(str).str.replace("YR", "")
-        data["date"] = pd.to_datetime(data["date"], format="%Y", errors='coerce')
-        # ------------------------
-        data = data.sort_values("date")
-        data["value"] = pd.to_numeric(data["value"], errors="coerce")
-        data = data.dropna()
-        return data
+        yr = datetime.now().year
+        data = wb.data.DataFrame(
+            indicator, economy=country, time=range(yr - 20, yr + 1), skipBlanks=True, numericTimeKeys=True
+        )
+        # Single economy -> one row, one column per year, ascending. Year keys are ints, or
+        # "YR2004"-style strings on wbgapi releases without numericTimeKeys.
+        dates = pd.to_datetime(data.columns.astype(str).str.lstrip("YR"), format="%Y", errors="coerce")
+        vals = data.to_numpy().ravel().astype(np.float32)
+        return pd.DataFrame({"date": dates, "value": vals}).dropna()
     except Exception as e:
         raise RuntimeError(f"World Bank fetch failed: {e}")
 
 @st.cache_data
 def synth_monthly(base=2.0, noise=0.5, months=36, seed=0):
     rng = np.random.default_rng(seed)
-    start = datetime.today() - relativedelta(months=months)
-    ts = [start + relativedelta(months=i) for i in range(months)]
+    start = pd.Timestamp.today().normalize() - pd.DateOffset(months=months)
+    ts = pd.date_range(start, periods=months, freq="MS")
     vals = base + np.cumsum(rng.normal(0, noise, size=months)) / 10.0
-    return pd.DataFrame({"date": ts, "value": vals})
+    return pd.DataFrame({"date": ts, "value": vals.astype(np.float32)})
 
 INDICATORS = {
     "CPI_YOY": {
@@ -145,56 +176,97 @@ COUNTRIES = {
     "TR": {"name": "Türkiye", "wb": "TUR"},
 }
 
+COUNTRY_KEYS = tuple(COUNTRIES)
+INDICATOR_KEYS = tuple(INDICATORS)
+
+# Stable demo-data seeds (hash() is salted per process, which breaks persisted cache keys).
+COUNTRY_SEED = {k: i for i, k in enumerate(COUNTRY_KEYS)}
+INDICATOR_SEED = {k: i for i, k in enumerate(INDICATOR_KEYS)}
+
 st.sidebar.title("⚙️ Controls")
 primary = st.sidebar.selectbox(
     "Primary economy",
-    options=list(COUNTRIES.keys()),
+    options=COUNTRY_KEYS,
     format_func=lambda k: COUNTRIES[k]["name"],
     index=0,
 )
 compare = st.sidebar.selectbox(
     "Compare to",
-    options=list(COUNTRIES.keys()),
+    options=COUNTRY_KEYS,
     format_func=lambda k: COUNTRIES[k]["name"],
     index=1,
 )
 
 sel_ind_1 = st.sidebar.selectbox(
     "Indicator",
-    options=list(INDICATORS.keys()),
+    options=INDICATOR_KEYS,
     format_func=lambda k: INDICATORS[k]["label"],
     index=0,
 )
 sel_ind_2 = st.sidebar.selectbox(
     "Second indicator (Charts tab)",
-    options=list(INDICATORS.keys()),
+    options=INDICATOR_KEYS,
     format_func=lambda k: INDICATORS[k]["label"],
     index=1,
 )
 
 def fetch_indicator(country_key: str, indicator_key: str) -> pd.DataFrame:
     meta = INDICATORS[indicator_key]
+    if country_key == "US":
+        df = meta["fetch"]("US")
+    else:
+        df = meta["fetch"](COUNTRIES[country_key]["wb"])
+    df = df[["date", "value"]].dropna()
+    return df.sort_values("date", ignore_index=True)
+
+def demo_indicator(country_key: str, indicator_key: str, reason: Exception) -> pd.DataFrame:
+    meta = INDICATORS[indicator_key]
+    st.warning(f"Using demo data for {COUNTRIES[country_key]['name']} – {meta['label']}. Reason: {reason}")
+    base = {"CPI_YOY": 3.0, "UNEMP": 5.0, "GDP_YOY": 2.0, "POLICY": 4.0}[indicator_key]
+    return synth_monthly(base=base, seed=COUNTRY_SEED[country_key] * len(INDICATOR_SEED) + INDICATOR_SEED[indicator_key])
+
+@st.cache_resource
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=8)
+
+def _try_fetch(country_key: str, indicator_key: str):
+    # Runs on a pool thread, so no st.* element calls: failures are handed back
+    # to the script thread, which shows the warning and demo data.
     try:
-        if country_key == "US":
-            df = meta["fetch"]("US")
-        else:
-            df = meta["fetch"](COUNTRIES[country_key]["wb"])
-        df = df[["date", "value"]].dropna()
-        return df
+        return fetch_indicator(country_key, indicator_key)
     except Exception as e:
-        st.warning(f"Using demo data for {COUNTRIES[country_key]['name']} – {meta['label']}. Reason: {e}")
-        base = {"CPI_YOY": 3.0, "UNEMP": 5.0, "GDP_YOY": 2.0, "POLICY": 4.0}[indicator_key]
-        return synth_monthly(base=base, seed=hash(country_key + indicator_key) % 10)
-
-primary_df_1 = fetch_indicator(primary, sel_ind_1)
-primary_df_2 = fetch_indicator(primary, sel_ind_2)
-compare_df_1 = fetch_indicator(compare, sel_ind_1)
+        return e
+
+def _prefetch(pairs):
+    # Fetches are I/O-bound, so run them side by side.
+    futures = {pair: _executor().submit(_try_fetch, *pair) for pair in dict.fromkeys(pairs)}
+    results = {}
+    for pair, fut in futures.items():
+        res = fut.result()
+        results[pair] = demo_indicator(*pair, res) if isinstance(res, Exception) else res
+    return results
+
+results = _prefetch([(primary, sel_ind_1), (primary, sel_ind_2), (compare, sel_ind_1)])
+primary_df_1 = results[(primary, sel_ind_1)]
+primary_df_2 = results[(primary, sel_ind_2)]
+compare_df_1 = results[(compare, sel_ind_1)]
 
 def latest_value(df: pd.DataFrame):
     if df.empty:
         return np.nan, None
-    last_row = df.sort_values("date").iloc[-1]
-    return float(last_row["value"]), pd.to_datetime(last_row["date"]).date()
+    return float(df["value"].iat[-1]), df["date"].iat[-1].date()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _line_fig(df: pd.DataFrame, y_label: str):
+    return px.line(df, x="date", y="value", labels={"value": y_label, "date": "Date"})
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _bar_fig(df: pd.DataFrame):
+    return px.bar(df, x="date", y="value", color="series", barmode="group")
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _compare_fig(df: pd.DataFrame, y_cols: list):
+    return px.line(df, x="date", y=y_cols)
 
 v1, d1 = latest_value(primary_df_1)
 v2, d2 = latest_value(primary_df_2)
@@ -212,9 +284,8 @@ with col_title:
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    delta = (
-        (primary_df_1.sort_values("date").iloc[-1]["value"] - primary_df_1.sort_values("date").iloc[-13]["value"]) if len(primary_df_1) > 13 else np.nan
-    )
+    vals = primary_df_1["value"].to_numpy()
+    delta = vals[-1] - vals[-13] if vals.size > 13 else np.nan
     st.markdown("### Key Metric")
     st.container().markdown(
         f"**{INDICATORS[sel_ind_1]['label']}**\n\n**{v1:.2f}{INDICATORS[sel_ind_1]['unit']}**  "+
@@ -231,6 +302,8 @@ with col2:
 
 with col3:
     st.markdown("### Notes quick-add")
+    # Not a fragment: the Notes tab renders outside col3, so a save needs the
+    # full rerun to show the new note there.
     with st.form("note_form"):
         default_note = (
             "Demand-pull pressures easing as goods disinflation offsets services. "
@@ -247,33 +320,46 @@ T1, T2, T3, T4 = st.tabs(["Charts", "Compare", "Events", "Notes"])
 with T1:
     st.subheader(f"{COUNTRIES[primary]['name']}: {INDICATORS[sel_ind_1]['label']}")
     if not primary_df_1.empty:
-        fig1 = px.line(primary_df_1, x="date", y="value", labels={"value": INDICATORS[sel_ind_1]["label"], "date": "Date"})
+        fig1 = _line_fig(primary_df_1, INDICATORS[sel_ind_1]["label"])
         st.plotly_chart(fig1, use_container_width=True)
 
     st.caption("Two-indicator view")
     if not primary_df_1.empty and not primary_df_2.empty:
-        df_merge = primary_df_1.merge(primary_df_2, on="date", suffixes=("_a", "_b"))
-        df_m = df_merge.melt("date", value_vars=["value_a", "value_b"], var_name="series", value_name="value")
-        df_m["series"] = df_m["series"].map({
+        series_labels = {
             "value_a": INDICATORS[sel_ind_1]["label"],
             "value_b": INDICATORS[sel_ind_2]["label"],
-        })
-        fig2 = px.bar(df_m, x="date", y="value", color="series", barmode="group")
+        }
+        df_m = (
+            pd.concat(
+                [primary_df_1.set_index("date")["value"], primary_df_2.set_index("date")["value"]],
+                axis=1,
+                keys=["value_a", "value_b"],
+                join="inner",
+            )
+            .stack()
+            .rename_axis(["date", "series"])
+            .reset_index(name="value")
+        )
+        df_m["series"] = pd.Categorical(
+            df_m["series"].map(series_labels),
+            categories=list(dict.fromkeys(series_labels.values())),
+        )
+        fig2 = _bar_fig(df_m)
         st.plotly_chart(fig2, use_container_width=True)
 
 with T2:
     st.subheader(f"{INDICATORS[sel_ind_1]['label']}: {COUNTRIES[primary]['name']} vs {COUNTRIES[compare]['name']}")
     if not primary_df_1.empty and not compare_df_1.empty:
-        left = primary_df_1.rename(columns={"value": COUNTRIES[primary]["name"]})
-        right = compare_df_1.rename(columns={"value": COUNTRIES[compare]["name"]})
-        merged = pd.merge_asof(left.sort_values("date"), right.sort_values("date"), on="date")
-        figc = px.line(merged, x="date", y=[COUNTRIES[primary]["name"], COUNTRIES[compare]["name"]])
+        # Put the primary on a month-start grid and carry the compare series forward onto
+        # it (WB data is annual), so the primary's full range is kept as with an asof join.
+        left = primary_df_1.set_index("date")["value"].resample("MS").ffill().rename(COUNTRIES[primary]["name"])
+        right = compare_df_1.set_index("date")["value"].reindex(left.index, method="ffill").rename(COUNTRIES[compare]["name"])
+        merged = pd.concat([left, right], axis=1).reset_index()
+        figc = _compare_fig(merged, [COUNTRIES[primary]["name"], COUNTRIES[compare]["name"]])
         st.plotly_chart(figc, use_container_width=True)
 
-with T3:
-    st.subheader("Policy & Shock Events")
-    st.caption("Tag central bank moves, fiscal changes, commodity shocks, etc., and link them to indicator trends.")
-
+@st.fragment
+def _event_form():
     with st.form("event_form", clear_on_submit=True):
         c1, c2, c3 = st.columns([1, 1, 3])
         with c1:
@@ -294,11 +380,17 @@ with T3:
     ])
 
     for ev in events:
-        st.container().markdown(
+        st.markdown(
             f"**{ev['tag']}** — {ev['note']}  \\n<span class='small-muted'>{ev['date']}</span>",
             unsafe_allow_html=True,
         )
 
+with T3:
+    st.subheader("Policy & Shock Events")
+    st.caption("Tag central bank moves, fiscal changes, commodity shocks, etc., and link them to indicator trends.")
+
+    _event_form()
+
 with T4:
     st.subheader("Theory-backed Notes")
     st.caption("Tie real data to macro models: AD–AS, IS–LM, Phillips Curve, Taylor Rule.")
@@ -306,7 +398,7 @@ with T4:
     notes = st.session_state.get("notes", [])
     if notes:
         for n in notes:
-            st.container().markdown(
+            st.markdown(
                 f"{n['text']}  \\n<span class='small-muted'>Saved {n['ts']}</span>",
                 unsafe_allow_html=True,
             )